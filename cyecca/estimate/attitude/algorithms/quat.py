@@ -213,7 +213,7 @@ def correct_accel(**kwargs):
         ca.SX([0, 0, 0]),
     )
 
-    Rs_accel = ca.SX.eye(2) * (std_accel + ca.norm_2(omega_m) ** 2 * std_accel_omega)
+    Rs_accel = ca.SX.eye(2) * (std_accel + ca.dot(omega_m, omega_m) * std_accel_omega)
 
     W_accel, K_accel, Ss_accel = util.sqrt_correct(Rs_accel, H_accel, W)
     S_accel = ca.mtimes(Ss_accel, Ss_accel.T)
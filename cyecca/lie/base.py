@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import os
+
 import casadi as ca
 
 from abc import ABC, abstractmethod
-from beartype import beartype
-from beartype.typing import List, Union
+from beartype import beartype as _beartype
+from beartype.typing import Callable, List, Union
 
 from cyecca.symbolic import casadi_to_sympy
 import sympy
@@ -18,6 +20,9 @@ __all__ = [
     "PARAM_TYPE",
 ]
 
+# CYECCA_FAST=1 skips runtime type checking of the lie classes
+beartype = (lambda f: f) if os.environ.get("CYECCA_FAST", "0") == "1" else _beartype
+
 SCALAR_TYPE = Union[ca.SX, ca.DM, float, int]
 PARAM_TYPE = Union[ca.SX, ca.DM]
 
@@ -257,10 +262,100 @@ class LieGroup(ABC):
         self.algebra = algebra
         self.n_param = n_param
         self.matrix_shape = matrix_shape
+        self._functions = {}
 
     def elem(self, param: PARAM_TYPE) -> LieGroupElement:
         return LieGroupElement(group=self, param=param)
 
+    def _function(self, name: str, f: Callable, *n_args: int) -> ca.Function:
+        """
+        Builds f, a function of parameter vectors, into a ca.Function once per
+        group and operation, so later calls evaluate it instead of rebuilding
+        the expression graph
+        """
+        if name not in self._functions:
+            x = [ca.SX.sym("x{:d}".format(i), n) for i, n in enumerate(n_args)]
+            self._functions[name] = ca.Function(name, x, [f(*x)])
+        return self._functions[name]
+
+    def _batch(
+        self, name: str, f: Callable, *args: PARAM_TYPE, parallelization: str
+    ) -> PARAM_TYPE:
+        """
+        Evaluates f, a function of element parameters, over a batch of
+        elements stacked as columns, the mapped function is built once per
+        operation, batch size and parallelization
+        """
+        n = args[0].shape[1]
+        key = (name, n, parallelization)
+        if key not in self._functions:
+            f = self._function(name, f, *[arg.shape[0] for arg in args])
+            self._functions[key] = f.map(n, parallelization)
+        return self._functions[key](*args)
+
+    def product_batch(
+        self, left: PARAM_TYPE, right: PARAM_TYPE, parallelization: str = "serial"
+    ) -> PARAM_TYPE:
+        """
+        product of N elements, parameters stacked as columns (n_param x N),
+        parallelization is passed to ca.Function.map: serial, openmp or thread
+        """
+        return self._batch(
+            "product",
+            lambda x, y: self.product(self.elem(x), self.elem(y)).param,
+            left,
+            right,
+            parallelization=parallelization,
+        )
+
+    def inverse_batch(
+        self, arg: PARAM_TYPE, parallelization: str = "serial"
+    ) -> PARAM_TYPE:
+        """
+        inverse of N elements, parameters stacked as columns (n_param x N)
+        """
+        return self._batch(
+            "inverse",
+            lambda x: self.inverse(self.elem(x)).param,
+            arg,
+            parallelization=parallelization,
+        )
+
+    def exp_batch(self, arg: PARAM_TYPE, parallelization: str = "serial") -> PARAM_TYPE:
+        """
+        exp of N algebra elements, parameters stacked as columns
+        """
+        return self._batch(
+            "exp",
+            lambda x: self.exp(self.algebra.elem(x)).param,
+            arg,
+            parallelization=parallelization,
+        )
+
+    def log_batch(self, arg: PARAM_TYPE, parallelization: str = "serial") -> PARAM_TYPE:
+        """
+        log of N elements, parameters stacked as columns (n_param x N)
+        """
+        return self._batch(
+            "log",
+            lambda x: self.log(self.elem(x)).param,
+            arg,
+            parallelization=parallelization,
+        )
+
+    def to_Matrix_batch(
+        self, arg: PARAM_TYPE, parallelization: str = "serial"
+    ) -> PARAM_TYPE:
+        """
+        matrices of N elements, returned side by side (n x n*N)
+        """
+        return self._batch(
+            "to_Matrix",
+            lambda x: self.to_Matrix(self.elem(x)),
+            arg,
+            parallelization=parallelization,
+        )
+
     def __mul__(self, other: LieGroup) -> LieGroupDirectProduct:
         """
         Implements Direct Product of Groups
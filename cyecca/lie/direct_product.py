@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import casadi as ca
 from cyecca.lie.base import *
-from beartype import beartype
+from cyecca.lie.base import beartype
 from beartype.typing import List, Union
 
 
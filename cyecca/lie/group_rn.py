@@ -6,7 +6,7 @@ from numpy import floating
 
 import casadi as ca
 
-from beartype import beartype
+from cyecca.lie.base import beartype
 from beartype.typing import Union
 
 from cyecca.lie.base import *
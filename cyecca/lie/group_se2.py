@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import casadi as ca
 
-from beartype import beartype
+from cyecca.lie.base import beartype
 from beartype.typing import List, Union
 
 from cyecca.lie.base import *
@@ -27,7 +27,9 @@ class SE2LieAlgebra(LieAlgebra):
         self, left: SE2LieAlgebraElement, right: SE2LieAlgebraElement
     ) -> SE2LieAlgebraElement:
         ## TODO: hard code the bracket here, avoid matrix math
-        c = left.to_Matrix() @ right.to_Matrix() - right.to_Matrix() @ left.to_Matrix()
+        L = left.to_Matrix()
+        R = right.to_Matrix()
+        c = L @ R - R @ L
         return self.elem(param=ca.vertcat(c[0, 2], c[1, 2], c[1, 0]))
 
     def addition(
@@ -52,7 +54,12 @@ class SE2LieAlgebra(LieAlgebra):
         return ad
 
     def to_Matrix(self, arg: SE2LieAlgebraElement) -> ca.SX:
-        return ca.vertcat(ca.horzcat(arg.Omega.to_Matrix(), arg.v_b.param), ca.SX(1, 3))
+        M = ca.SX(3, 3)
+        M[0, 1] = -arg.param[2]
+        M[1, 0] = arg.param[2]
+        M[0, 2] = arg.param[0]
+        M[1, 2] = arg.param[1]
+        return M
 
     def from_Matrix(self, arg: ca.SX) -> SE2LieAlgebraElement:
         raise NotImplementedError("")
@@ -91,53 +98,40 @@ class SE2LieGroup(LieGroup):
         return SE2LieGroupElement(group=self, param=param)
 
     def product(self, left: SE2LieGroupElement, right: SE2LieGroupElement):
-        p = left.R @ right.p + left.p
-        R = left.R * right.R
-        return self.elem(ca.vertcat(p.param, R.param))
+        f = self._function("product", _product, self.n_param, self.n_param)
+        return self.elem(param=f(left.param, right.param))
 
     def inverse(self, arg: SE2LieGroupElement) -> SE2LieGroupElement:
-        p = -(arg.R.inverse() @ arg.p)
-        return self.elem(param=ca.vertcat(p.param, -arg.R.param))
+        f = self._function("inverse", _inverse, self.n_param)
+        return self.elem(param=f(arg.param))
 
     def identity(self) -> SE2LieGroupElement:
         return self.elem(param=ca.vertcat(R2.identity().param, SO2.identity().param))
 
     def adjoint(self, arg: SE2LieGroupElement):
-        v = ca.vertcat(arg.param[1], -arg.param[0])
-        theta = SO2.elem(param=arg.param[2:])
-        horz1 = ca.horzcat(theta.to_Matrix(), v)
-        horz2 = ca.horzcat(ca.SX(1, 2), 1)
-        return ca.vertcat(horz1, horz2)
+        return self._function("adjoint", _adjoint, self.n_param)(arg.param)
 
     def exp(self, arg: SE2LieAlgebraElement) -> SE2LieGroupElement:
-        theta = arg.Omega.param
-        sin_th = ca.sin(theta)
-        cos_th = ca.cos(theta)
-        a = SERIES["sin(x)/x"](theta)
-        b = SERIES["(1 - cos(x))/x"](theta)
-        V = ca.vertcat(ca.horzcat(a, -b), ca.horzcat(b, a))
-        p = V @ arg.v_b.param
-        return self.elem(ca.vertcat(p, theta))
+        f = self._function("exp", _exp, self.algebra.n_param)
+        return self.elem(param=f(arg.param))
 
     def log(self, arg: SE2LieGroupElement) -> SE2LieAlgebraElement:
-        theta = arg.R.param
-        x = ca.SX.sym("x")
-        a = SERIES["sin(x)/x"](theta)
-        b = SERIES["(1 - cos(x))/x"](theta)
-        V_inv = ca.SX(2, 2)
-        V_inv[0, 0] = a
-        V_inv[0, 1] = b
-        V_inv[1, 0] = -b
-        V_inv[1, 1] = a
-        V_inv = V_inv / (a**2 + b**2)  # TODO, check being 0 is impossible
-        p = V_inv @ arg.p.param
-        return self.algebra.elem(ca.vertcat(p, theta))
+        f = self._function("log", _log, self.n_param)
+        return self.algebra.elem(param=f(arg.param))
 
     def to_Matrix(self, arg: SE2LieGroupElement) -> ca.SX:
-        return ca.vertcat(
-            ca.horzcat(arg.R.to_Matrix(), arg.p.param),
-            ca.horzcat(ca.SX(1, 2), ca.SX.eye(1)),
-        )
+        theta = arg.param[2]
+        c = ca.cos(theta)
+        s = ca.sin(theta)
+        M = ca.SX(3, 3)
+        M[0, 0] = c
+        M[0, 1] = -s
+        M[1, 0] = s
+        M[1, 1] = c
+        M[0, 2] = arg.param[0]
+        M[1, 2] = arg.param[1]
+        M[2, 2] = 1
+        return M
 
     def from_Matrix(self, arg: ca.SX) -> SE2LieAlgebraElement:
         return self.LieAlgebraElement(
@@ -167,3 +161,54 @@ class SE2LieGroupElement(LieGroupElement):
 
 se2 = SE2LieAlgebra()
 SE2 = SE2LieGroup()
+
+
+def _product(left: ca.SX, right: ca.SX) -> ca.SX:
+    c = ca.cos(left[2])
+    s = ca.sin(left[2])
+    x = c * right[0] - s * right[1] + left[0]
+    y = s * right[0] + c * right[1] + left[1]
+    return ca.vertcat(x, y, left[2] + right[2])
+
+
+def _inverse(arg: ca.SX) -> ca.SX:
+    c = ca.cos(arg[2])
+    s = ca.sin(arg[2])
+    x = -(c * arg[0] + s * arg[1])
+    y = s * arg[0] - c * arg[1]
+    return ca.vertcat(x, y, -arg[2])
+
+
+def _adjoint(arg: ca.SX) -> ca.SX:
+    c = ca.cos(arg[2])
+    s = ca.sin(arg[2])
+    M = ca.SX(3, 3)
+    M[0, 0] = c
+    M[0, 1] = -s
+    M[1, 0] = s
+    M[1, 1] = c
+    M[0, 2] = arg[1]
+    M[1, 2] = -arg[0]
+    M[2, 2] = 1
+    return M
+
+
+def _exp(arg: ca.SX) -> ca.SX:
+    theta = arg[2]
+    a = SERIES["sin(x)/x"](theta)
+    b = SERIES["(1 - cos(x))/x"](theta)
+    x = arg[0]
+    y = arg[1]
+    return ca.vertcat(a * x - b * y, b * x + a * y, theta)
+
+
+def _log(arg: ca.SX) -> ca.SX:
+    theta = arg[2]
+    a = SERIES["sin(x)/x"](theta)
+    b = SERIES["(1 - cos(x))/x"](theta)
+    # V^-1 p in closed form, a^2 + b^2 = 2 (1 - cos(theta))/theta^2 is only
+    # zero for theta a nonzero multiple of 2 pi
+    c = 1 / (a**2 + b**2)
+    x = arg[0]
+    y = arg[1]
+    return ca.vertcat(c * (a * x + b * y), c * (a * y - b * x), theta)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from beartype import beartype
+from cyecca.lie.base import beartype
 from beartype.typing import List
 
 import casadi as ca
@@ -16,6 +16,31 @@ from cyecca.symbolic import SERIES, SQUARED_SERIES
 
 __all__ = ["se23", "SE23Quat", "SE23Mrp"]
 
+# series in theta^2, looked up once rather than on every call
+_LOG_V_INV = SQUARED_SERIES["(1 - x*sin(x)/(2*(1 - cos(x))))/x^2"]
+
+
+def _exp_coefficients():
+    """
+    (1 - cos(x))/x^2, (x - sin(x))/x^3, (x^2/2 + cos(x) - 1)/x^4 in x = theta^2,
+    sharing one sqrt, sin and cos between the three
+    """
+    x = ca.SX.sym("x")
+    C = [
+        SQUARED_SERIES["(1 - cos(x))/x^2"](x),
+        SQUARED_SERIES["(x - sin(x))/x^3"](x),
+        SQUARED_SERIES["(x^2/2 + cos(x) - 1)/x^4"](x),
+    ]
+    return ca.Function("exp_coefficients", [x], ca.cse(C))
+
+
+_EXP_COEFFICIENTS = _exp_coefficients()
+
+# constant blocks, shared between calls, never assigned into
+_I3 = ca.DM.eye(3)
+_Z3 = ca.DM(3, 3)
+_Z25 = ca.DM(2, 5)
+
 
 @beartype
 class SE23LieAlgebra(LieAlgebra):
@@ -26,18 +51,14 @@ class SE23LieAlgebra(LieAlgebra):
         return SE23LieAlgebraElement(algebra=self, param=param)
 
     def bracket(self, left: SE23LieAlgebraElement, right: SE23LieAlgebraElement):
-        c = left.to_Matrix() @ right.to_Matrix() - right.to_Matrix() @ left.to_Matrix()
+        # [X1, X2] in closed form, avoids the 5x5 matrix commutator
+        w1 = left.param[6:]
+        w2 = right.param[6:]
         return self.elem(
             param=ca.vertcat(
-                c[0, 4],
-                c[1, 4],
-                c[2, 4],
-                c[0, 3],
-                c[1, 3],
-                c[2, 3],
-                c[2, 1],
-                c[0, 2],
-                c[1, 0],
+                ca.cross(w1, right.param[:3]) - ca.cross(w2, left.param[:3]),
+                ca.cross(w1, right.param[3:6]) - ca.cross(w2, left.param[3:6]),
+                ca.cross(w1, w2),
             )
         )
 
@@ -52,19 +73,21 @@ class SE23LieAlgebra(LieAlgebra):
         return self.elem(param=left * right.param)
 
     def adjoint(self, arg: SE23LieAlgebraElement):
-        a_b_x = so3.wedge(arg.a_b.param).to_Matrix()
-        v_b_x = so3.wedge(arg.v_b.param).to_Matrix()
-        Omega = arg.Omega.to_Matrix()
-        Z3 = ca.SX(3, 3)
-        return ca.vertcat(
-            ca.horzcat(Omega, Z3, v_b_x),
-            ca.horzcat(Z3, Omega, a_b_x),
-            ca.horzcat(Z3, Z3, Omega),
+        # 9x9, acting on (v_b, a_b, Omega) so that ad(x) y = [x, y]
+        v_b_x = so3.elem(arg.param[:3]).to_Matrix()
+        a_b_x = so3.elem(arg.param[3:6]).to_Matrix()
+        Omega = so3.elem(arg.param[6:]).to_Matrix()
+        return ca.blockcat(
+            [
+                [Omega, _Z3, v_b_x],
+                [_Z3, Omega, a_b_x],
+                [_Z3, _Z3, Omega],
+            ]
         )
 
     def to_Matrix(self, arg: SE23LieAlgebraElement) -> ca.SX:
         return ca.vertcat(
-            ca.horzcat(arg.Omega.to_Matrix(), arg.a_b.param, arg.v_b.param), ca.SX(2, 5)
+            ca.horzcat(arg.Omega.to_Matrix(), arg.a_b.param, arg.v_b.param), _Z25
         )
 
     def from_Matrix(self, arg: ca.SX) -> SE23LieAlgebraElement:
@@ -151,64 +174,74 @@ class SE23LieGroup(LieGroup):
         return SE23LieGroupElement(group=self, param=param)
 
     def product(self, left: SE23LieGroupElement, right: SE23LieGroupElement):
-        p = left.p + left.R @ right.p
-        v = left.v + left.R @ right.v
-        R = left.R * right.R
-        return self.elem(param=ca.vertcat(p.param, v.param, R.param))
+        f = self._function("product", self._product, self.n_param, self.n_param)
+        return self.elem(param=f(left.param, right.param))
+
+    def _product(self, x: ca.SX, y: ca.SX) -> ca.SX:
+        R_left = self.SO3.elem(x[6:])
+        R_right = self.SO3.elem(y[6:])
+        # p and v, stacked as the columns of a 3x2, are rotated together
+        PV = ca.reshape(x[:6], 3, 2) + R_left.to_Matrix() @ ca.reshape(y[:6], 3, 2)
+        R = R_left * R_right
+        return ca.vertcat(ca.vec(PV), R.param)
 
     def inverse(self, arg):
-        R_inv = arg.R.inverse()
-        p_inv = -(R_inv @ arg.p)
-        v_inv = -(R_inv @ arg.v)
-        return self.elem(param=ca.vertcat(p_inv.param, v_inv.param, R_inv.param))
+        f = self._function("inverse", self._inverse, self.n_param)
+        return self.elem(param=f(arg.param))
+
+    def _inverse(self, x: ca.SX) -> ca.SX:
+        R = self.SO3.elem(x[6:])
+        PV = -(R.to_Matrix().T @ ca.reshape(x[:6], 3, 2))
+        return ca.vertcat(ca.vec(PV), R.inverse().param)
 
     def identity(self) -> SE23LieGroupElement:
-        p = R3.identity()
-        v = R3.identity()
-        R = self.SO3.identity()
-        return self.elem(param=ca.vertcat(p.param, v.param, R.param))
+        return self.elem(param=ca.vertcat(ca.SX(6, 1), self.SO3.identity().param))
 
     def adjoint(self, arg: SE23LieGroupElement):
-        px = so3.wedge(arg.p.param).to_Matrix()
-        vx = so3.wedge(arg.v.param).to_Matrix()
+        return self._function("adjoint", self._adjoint, self.n_param)(arg.param)
+
+    def _adjoint(self, x: ca.SX) -> ca.SX:
+        arg = self.elem(x)
         R = arg.R.to_Matrix()
-        Z3 = ca.SX(3, 3)
+        # p^ R and v^ R, computed as cross products with the columns of R
+        pxR = ca.cross(ca.repmat(arg.param[:3], 1, 3), R)
+        vxR = ca.cross(ca.repmat(arg.param[3:6], 1, 3), R)
         return ca.vertcat(
-            ca.horzcat(R, Z3, px @ R), ca.horzcat(Z3, R, vx @ R), ca.horzcat(Z3, Z3, R)
+            ca.horzcat(R, _Z3, pxR), ca.horzcat(_Z3, R, vxR), ca.horzcat(_Z3, _Z3, R)
         )
 
     def exp(self, arg: SE23LieAlgebraElement) -> SE23LieGroupElement:
-        X = arg.to_Matrix()
-        n = X.shape[0]
-        I = ca.SX.eye(n)
-        X2 = X @ X
-        X3 = X2 @ X  # TODO, why is there an X3 here, shouldn't it be a function of X?
+        f = self._function("exp", self._exp, self.algebra.n_param)
+        return self.elem(param=f(arg.param))
+
+    def _exp(self, x: ca.SX) -> ca.SX:
+        arg = self.algebra.elem(x)
         o = arg.Omega.param
         theta_sq = ca.dot(o, o)
-        C1 = SQUARED_SERIES["(1 - cos(x))/x^2"](theta_sq)
-        C2 = SQUARED_SERIES["(x - sin(x))/x^3"](theta_sq)
-        return self.from_Matrix(ca.SX.eye(5) + X @ (I + C1 * X + C2 * X @ X))
+        C1, C2, _ = _EXP_COEFFICIENTS(theta_sq)
+        # closed form, V = I + C1 Omega + C2 Omega^2 applied to v_b and a_b,
+        # with Omega u = o x u, avoids the 5x5 matrix power series
+        U = ca.horzcat(arg.v_b.param, arg.a_b.param)
+        O = ca.repmat(o, 1, 2)
+        OU = ca.cross(O, U)
+        P = U + C1 * OU + C2 * ca.cross(O, OU)
+        R = arg.Omega.exp(self.SO3)
+        return ca.vertcat(P[:, 0], P[:, 1], R.param)
 
     def calculate_N(self, v: SE23LieAlgebraElement, B: ca.SX) -> ca.SX:
         n = B.shape[0]
-        omega = v.Omega
-        Omega = omega.to_Matrix()
-        OmegaSq = Omega @ Omega
         A = ca.sparsify(ca.horzcat(v.a_b.param, v.v_b.param))
         B = ca.sparsify(B)
-        o = omega.param
+        o = v.Omega.param
         theta_sq = ca.dot(o, o)
-        C1 = SQUARED_SERIES["(1 - cos(x))/x^2"](theta_sq)
-        C2 = SQUARED_SERIES["(x - sin(x))/x^3"](theta_sq)
-        C3 = SQUARED_SERIES["(x^2/2 + cos(x) - 1)/x^4"](theta_sq)
+        C1, C2, C3 = _EXP_COEFFICIENTS(theta_sq)
+        # Omega A and Omega^2 A, as cross products with the columns of A
+        O = ca.repmat(o, 1, A.shape[1])
+        OA = ca.cross(O, A)
+        OOA = ca.cross(O, OA)
         AB = A @ B
         I = ca.SX.eye(n)
-        return (
-            A
-            + AB / 2
-            + Omega @ A @ (C1 * I + C2 * B)
-            + Omega @ Omega @ A @ (C2 * I + C3 * B)
-        )
+        return A + AB / 2 + OA @ (C1 * I + C2 * B) + OOA @ (C2 * I + C3 * B)
 
     def exp_mixed(
         self,
@@ -217,7 +250,6 @@ class SE23LieGroup(LieGroup):
         r: SE23LieAlgebraElement,
         B: ca.SX,
     ) -> SE23LieGroupElement:
-        n = B.shape[0]
         P0 = ca.horzcat(X0.v.param, X0.p.param)
         Pl = self.calculate_N(l, B)
         Pr = self.calculate_N(r, -B)
@@ -227,27 +259,35 @@ class SE23LieGroup(LieGroup):
         Rr0 = Rr * R0
         R1 = Rr0 * Rl
 
-        I = ca.SX.eye(n)
-        P1 = Rr0.to_Matrix() @ Pl + (Rr.to_Matrix() @ P0 + Pr) @ (I + B)
-        return self.elem(ca.vertcat(P1[:, 1], P1[:, 0], R1.param))
+        # Q (I + B) as Q + Q B, B is typically sparse
+        Q = Rr.to_Matrix() @ P0 + Pr
+        P1 = Rr0.to_Matrix() @ Pl + Q + Q @ ca.sparsify(B)
+        v1 = P1[:, 0]
+        p1 = P1[:, 1]
+        return self.elem(ca.vertcat(p1, v1, R1.param))
 
     def log(self, arg: SE23LieGroupElement) -> SE23LieAlgebraElement:
-        omega = arg.R.log()
-        o = omega.param
-        theta_sq = ca.dot(o, o)
+        f = self._function("log", self._log, self.n_param)
+        return self.algebra.elem(param=f(arg.param))
+
+    def _log(self, x: ca.SX) -> ca.SX:
+        arg = self.elem(x)
+        omega, theta_sq = self.SO3.log_with_theta_sq(arg.R)
         Omega = omega.to_Matrix()
-        A = SQUARED_SERIES["(1 - x*sin(x)/(2*(1 - cos(x))))/x^2"](theta_sq)
-        B = SQUARED_SERIES["1/x^2"](theta_sq)
-        V_inv = ca.SX.eye(3) - Omega / 2 + A * (Omega @ Omega)
+        A = _LOG_V_INV(theta_sq)
+        V_inv = _I3 - Omega / 2 + A * (Omega @ Omega)
         u = V_inv @ arg.p.param
         a = V_inv @ arg.v.param
-        return self.algebra.elem(ca.vertcat(u, a, omega.param))
+        return ca.vertcat(u, a, omega.param)
 
     def to_Matrix(self, arg: SE23LieGroupElement) -> ca.SX:
-        return ca.vertcat(
-            ca.horzcat(arg.R.to_Matrix(), arg.v.param, arg.p.param),
-            ca.horzcat(ca.SX(2, 3), ca.SX.eye(2)),
-        )
+        M = ca.SX(5, 5)
+        M[:3, :3] = arg.R.to_Matrix()
+        M[:3, 3] = arg.param[3:6]
+        M[:3, 4] = arg.param[:3]
+        M[3, 3] = 1
+        M[4, 4] = 1
+        return M
 
     def from_Matrix(self, arg: ca.SX) -> SE23LieGroupElement:
         SO3 = self.SO3
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import casadi as ca
 
-from beartype import beartype
+from cyecca.lie.base import beartype
 from beartype.typing import List, Union
 
 from cyecca.lie.base import *
@@ -27,7 +27,9 @@ class SE3LieAlgebra(LieAlgebra):
         return SE3LieAlgebraElement(algebra=self, param=param)
 
     def bracket(self, left: SE3LieAlgebraElement, right: SE3LieAlgebraElement):
-        c = left.to_Matrix() @ right.to_Matrix() - right.to_Matrix() @ left.to_Matrix()
+        L = left.to_Matrix()
+        R = right.to_Matrix()
+        c = L @ R - R @ L
         return self.elem(
             param=ca.vertcat(c[0, 3], c[1, 3], c[2, 3], c[2, 1], c[0, 2], c[1, 0])
         )
@@ -182,10 +184,10 @@ class SE3LieGroup(LieGroup):
         return self.elem(ca.vertcat(ca.SX(3, 1), self.SO3.identity().param))
 
     def adjoint(self, arg: SE3LieGroupElement):
-        v = arg.param[:3]
-        vx = so3.elem(param=v).to_Matrix()
         R = self.SO3.elem(param=arg.param[3:]).to_Matrix()
-        horz1 = ca.horzcat(R, ca.times(vx, R))
+        # v^ R, computed as cross products with the columns of R
+        vxR = ca.cross(ca.repmat(arg.param[:3], 1, 3), R)
+        horz1 = ca.horzcat(R, vxR)
         horz2 = ca.horzcat(ca.SX(3, 3), R)
         return ca.vertcat(horz1, horz2)
 
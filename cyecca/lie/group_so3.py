@@ -5,8 +5,8 @@ from enum import Enum
 
 import casadi as ca
 
-from beartype import beartype
-from beartype.typing import List, Union
+from cyecca.lie.base import beartype
+from beartype.typing import List, Tuple, Union
 
 from cyecca.lie.base import *
 from cyecca.lie.group_rn import R3LieGroupElement, R3LieAlgebraElement
@@ -36,7 +36,9 @@ class SO3LieAlgebra(LieAlgebra):
     def bracket(
         self, left: SO3LieAlgebraElement, right: SO3LieAlgebraElement
     ) -> SO3LieAlgebraElement:
-        c = left.to_Matrix() @ right.to_Matrix() - right.to_Matrix() @ left.to_Matrix()
+        L = left.to_Matrix()
+        R = right.to_Matrix()
+        c = L @ R - R @ L
         return self.elem(param=ca.vertcat(c[2, 1], c[0, 2], c[1, 0]))
 
     def addition(
@@ -197,6 +199,15 @@ class SO3LieGroup(LieGroup):
         """
         return left.to_Matrix() @ right
 
+    def log_with_theta_sq(
+        self, arg: SO3LieGroupElement
+    ) -> Tuple[SO3LieAlgebraElement, ca.SX]:
+        """
+        Log along with the squared rotation angle, for callers that need both
+        """
+        omega = self.log(arg)
+        return omega, ca.dot(omega.param, omega.param)
+
 
 @beartype
 class SO3LieGroupElement(LieGroupElement):
@@ -252,7 +263,9 @@ class SO3DcmLieGroup(SO3LieGroup):
     def log(self, arg: SO3DcmLieGroupElement) -> SO3LieAlgebraElement:
         R = self.to_Matrix(arg)
         e1 = (ca.trace(R) - 1) / 2
-        theta = ca.if_else(e1 > 1, 0, ca.if_else(e1 < -1, ca.pi, ca.acos(e1)))
+        # clamp round off outside of [-1, 1], rather than selecting between
+        # branches that are all evaluated
+        theta = ca.acos(ca.fmin(ca.fmax(e1, -1), 1))
         C1 = SERIES["x/sin(x)"](theta) / 2
         return self.algebra.from_Matrix((R - R.T) * C1)
 
@@ -504,44 +517,39 @@ class SO3QuatLieGroup(SO3LieGroup):
     def from_Matrix(self, arg: ca.SX) -> SO3QuatLieGroupElement:
         assert arg.shape == (3, 3)
         R = arg
-        b1 = 0.5 * ca.sqrt(1 + R[0, 0] + R[1, 1] + R[2, 2])
-        b2 = 0.5 * ca.sqrt(1 + R[0, 0] - R[1, 1] - R[2, 2])
-        b3 = 0.5 * ca.sqrt(1 - R[0, 0] + R[1, 1] - R[2, 2])
-        b4 = 0.5 * ca.sqrt(1 - R[0, 0] - R[1, 1] + R[2, 2])
-
-        q1 = ca.SX(4, 1)
-        q1[0] = b1
-        q1[1] = (R[2, 1] - R[1, 2]) / (4 * b1)
-        q1[2] = (R[0, 2] - R[2, 0]) / (4 * b1)
-        q1[3] = (R[1, 0] - R[0, 1]) / (4 * b1)
-
-        q2 = ca.SX(4, 1)
-        q2[0] = (R[2, 1] - R[1, 2]) / (4 * b2)
-        q2[1] = b2
-        q2[2] = (R[0, 1] + R[1, 0]) / (4 * b2)
-        q2[3] = (R[0, 2] + R[2, 0]) / (4 * b2)
-
-        q3 = ca.SX(4, 1)
-        q3[0] = (R[0, 2] - R[2, 0]) / (4 * b3)
-        q3[1] = (R[0, 1] + R[1, 0]) / (4 * b3)
-        q3[2] = b3
-        q3[3] = (R[1, 2] + R[2, 1]) / (4 * b3)
-
-        q4 = ca.SX(4, 1)
-        q4[0] = (R[1, 0] - R[0, 1]) / (4 * b4)
-        q4[1] = (R[0, 2] + R[2, 0]) / (4 * b4)
-        q4[2] = (R[1, 2] + R[2, 1]) / (4 * b4)
-        q4[3] = b4
-
-        q = ca.if_else(
-            ca.trace(R) > 0,
-            q1,
-            ca.if_else(
-                ca.logic_and(R[0, 0] > R[1, 1], R[0, 0] > R[2, 2]),
-                q2,
-                ca.if_else(R[1, 1] > R[2, 2], q3, q4),
-            ),
+        # Shepperd's method, select the largest of 4 q_i^2 first, so only
+        # one sqrt and one division are evaluated rather than all four branches
+        t1 = 1 + R[0, 0] + R[1, 1] + R[2, 2]
+        t2 = 1 + R[0, 0] - R[1, 1] - R[2, 2]
+        t3 = 1 - R[0, 0] + R[1, 1] - R[2, 2]
+        t4 = 1 - R[0, 0] - R[1, 1] + R[2, 2]
+        a = R[2, 1] - R[1, 2]
+        b = R[0, 2] - R[2, 0]
+        c = R[1, 0] - R[0, 1]
+        d = R[0, 1] + R[1, 0]
+        e = R[0, 2] + R[2, 0]
+        f = R[1, 2] + R[2, 1]
+
+        def select(x1, x2, x3, x4):
+            return ca.if_else(
+                ca.trace(R) > 0,
+                x1,
+                ca.if_else(
+                    ca.logic_and(R[0, 0] > R[1, 1], R[0, 0] > R[2, 2]),
+                    x2,
+                    ca.if_else(R[1, 1] > R[2, 2], x3, x4),
+                ),
+            )
+
+        # t_i = 4 q_i^2, so q = n / (4 q_i) = n / (2 sqrt(t_i))
+        t = select(t1, t2, t3, t4)
+        n = select(
+            ca.vertcat(t1, a, b, c),
+            ca.vertcat(a, t2, d, e),
+            ca.vertcat(b, d, t3, f),
+            ca.vertcat(c, e, f, t4),
         )
+        q = n * (0.5 / ca.sqrt(t))
         return SO3Quat.elem(q)
 
     def from_Mrp(self, arg: SO3MrpLieGroupElement) -> SO3QuatLieGroupElement:
@@ -626,6 +634,14 @@ class SO3MrpLieGroup(SO3LieGroup):
         A = SQUARED_SERIES["4 atan(x)/x"](theta_sq)
         return self.algebra.elem(param=A * r)
 
+    def log_with_theta_sq(
+        self, arg: SO3MrpLieGroupElement
+    ) -> Tuple[SO3LieAlgebraElement, ca.SX]:
+        r = arg.param
+        n_sq = ca.dot(r, r)
+        A = SQUARED_SERIES["4 atan(x)/x"](n_sq)
+        return self.algebra.elem(param=A * r), A * A * n_sq
+
     def right_jacobian(self, arg: SO3LieGroupElement) -> ca.SX:
         r = arg.param
         n_sq = ca.dot(r, r)
@@ -132,7 +132,7 @@ def derive_model():
     # Force and Moment Model
     cl = cl0 + cla * (-1 * alpha)  # Lift Coefficient
 
-    qbar = 0.5 * rho * ca.norm_2(velocity_w_w) ** 2
+    qbar = 0.5 * rho * ca.dot(velocity_w_w, velocity_w_w)
 
     ground = ca.if_else(
         position_w[2] < 0.0,
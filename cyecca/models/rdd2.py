@@ -1,7 +1,11 @@
 import argparse
+import functools
+import hashlib
 import os
+import subprocess
 import sys
 import math
+import tempfile
 import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
@@ -36,12 +40,108 @@ kp_vel = 2.0  # velocity proportional gain
 z_integral_max = 0  # 5.0
 ki_z = 0.05  # velocity z integral gain
 
+# control allocation
+n_motors = 4  # number of motors
+_MOTOR_ZEROS = ca.DM.zeros(n_motors)  # constant per motor vectors
+_MOTOR_ONES = ca.DM.ones(n_motors)
+
+# CYECCA_JIT=1 compiles the hot estimator functions to native code on first call
+_JIT_OPTIONS = (
+    {
+        "jit": True,
+        "compiler": "shell",
+        "jit_options": {"flags": ["-O3", "-march=native"]},
+    }
+    if os.environ.get("CYECCA_JIT", "0") == "1"
+    else {}
+)
+
+# cached functions and libraries are loaded without further checks, so the
+# default cache is per user rather than in a shared temporary directory
+_USER_CACHE = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "cyecca"
+)
 
+# derived functions are saved here, keyed by a hash of the code they are built from
+_CACHE_DIR = Path(os.environ.get("CYECCA_CACHE", _USER_CACHE)) / "cyecca_fns"
+
+
+@functools.lru_cache(maxsize=None)
+def _source_hash():
+    """
+    hash of this module, cyecca.lie and cyecca.symbolic, and the casadi version
+    """
+    root = Path(__file__).resolve().parents[1]
+    h = hashlib.sha1(ca.__version__.encode())
+    for path in [Path(__file__).resolve(), root / "symbolic.py"] + sorted(
+        (root / "lie").glob("*.py")
+    ):
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _replace_into(path, write):
+    """
+    write to a temporary file next to path, then move it into place, so
+    concurrent writers and interrupted writes never leave a partial file
+    """
+    tmp_path = path.with_name("{:s}.{:d}.tmp".format(path.name, os.getpid()))
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_or_derive(derive):
+    """
+    load the functions of derive from the disk cache, derive and save them on
+    a miss, any cache fault falls back to deriving
+    """
+    key = hashlib.sha1(
+        (_source_hash() + derive.__name__ + str(_JIT_OPTIONS)).encode()
+    ).hexdigest()
+    index = _CACHE_DIR / "{:s}.txt".format(key)
+
+    def path(name):
+        return _CACHE_DIR / "{:s}_{:s}.casadi".format(key, name)
+
+    try:
+        if index.exists():
+            return {
+                name: ca.Function.load(str(path(name)))
+                for name in index.read_text().split()
+            }
+    except (OSError, RuntimeError):
+        pass
+
+    eqs = derive()
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        for name, eq in eqs.items():
+            _replace_into(path(name), lambda p: eq.save(str(p)))
+        # written last, so a partially saved entry is never loaded
+        _replace_into(index, lambda p: p.write_text("\n".join(eqs.keys())))
+    except (OSError, RuntimeError):
+        pass
+    return eqs
+
+
+def _cached(derive):
+    """
+    cache the functions returned by a derive function in memory and on disk
+    """
+
+    @functools.wraps(derive)
+    def wrapper():
+        return dict(_load_or_derive(derive))
+
+    return wrapper
+
+
+@_cached
 def derive_control_allocation():
     """
     quadrotor control allocation
     """
-    n_motors = 4
     l = ca.SX.sym("l")
     Cm = ca.SX.sym("Cm")
     Ct = ca.SX.sym("Ct")
@@ -51,27 +151,24 @@ def derive_control_allocation():
 
     T_max = n_motors * F_max
     F_min = 0
-    A = ca.vertcat(
-        ca.horzcat(
-            1 / n_motors, -1 / (n_motors * l), -1 / (n_motors * l), -1 / (n_motors * Cm)
-        ),
-        ca.horzcat(
-            1 / n_motors, 1 / (n_motors * l), 1 / (n_motors * l), -1 / (n_motors * Cm)
-        ),
-        ca.horzcat(
-            1 / n_motors, 1 / (n_motors * l), -1 / (n_motors * l), 1 / (n_motors * Cm)
-        ),
-        ca.horzcat(
-            1 / n_motors, -1 / (n_motors * l), 1 / (n_motors * l), 1 / (n_motors * Cm)
-        ),
+    # allocation A = [1/n, signs diag(1/(n l), 1/(n l), 1/(n Cm))], the thrust
+    # column is constant and the moment columns are a numeric sign pattern
+    A_sign = ca.DM(
+        [
+            [-1, -1, -1],
+            [1, 1, -1],
+            [1, -1, 1],
+            [-1, 1, 1],
+        ]
     )
+    A_scale = 1 / (n_motors * ca.vertcat(l, l, Cm))
 
-    T_sat = saturate(T, 0, T_max)
+    T_sat = ca.fmin(ca.fmax(T, 0), T_max)
     M_max = l * T_max / 2  # max moment when half of motors on and half off
-    M_sat = saturatem(M, -M_max * ca.SX.ones(3), M_max * ca.SX.ones(3))
+    M_sat = saturatem(M, -M_max, M_max)
 
-    F_moment = A @ ca.vertcat(0, M_sat)  # motor force for moment
-    F_thrust = A @ ca.vertcat(T_sat, 0, 0, 0)  # motor force for thrust
+    F_moment = A_sign @ (A_scale * M_sat)  # motor force for moment
+    F_thrust = T_sat / n_motors * _MOTOR_ONES  # motor force for thrust
     F_sum = F_moment + F_thrust
 
     saturation_logic = True
@@ -83,7 +180,7 @@ def derive_control_allocation():
         Fp_thrust = ca.if_else(
             C1 > 0,
             ca.if_else(C2 > 0, F_thrust, F_thrust - C2),
-            ca.if_else(C2 > 0, F_thrust + C1, F_max / 2 * ca.SX.ones(4, 1)),
+            ca.if_else(C2 > 0, F_thrust + C1, F_max / 2 * _MOTOR_ONES),
         )
 
         largest_moment = ca.mmax(ca.fabs(F_moment))
@@ -96,9 +193,7 @@ def derive_control_allocation():
             F_moment,
         )
 
-        Fp_sum = saturatem(
-            Fp_moment + Fp_thrust, ca.SX.zeros(n_motors), F_max * ca.SX.ones(n_motors)
-        )
+        Fp_sum = saturatem(Fp_moment + Fp_thrust, _MOTOR_ZEROS, F_max * _MOTOR_ONES)
     else:
         Fp_sum = F_sum
 
@@ -107,7 +202,7 @@ def derive_control_allocation():
     f_alloc = ca.Function(
         "control_allocation",
         [F_max, l, Cm, Ct, T, M],
-        [omega, Fp_sum, F_moment, F_thrust, M_sat],
+        ca.cse([omega, Fp_sum, F_moment, F_thrust, M_sat]),
         ["F_max", "l", "Cm", "Ct", "T", "M"],
         ["omega", "Fp_sum", "F_moment", "F_thrust", "M_sat"],
     )
@@ -116,21 +211,15 @@ def derive_control_allocation():
 
 def saturatem(x, x_min, x_max):
     """
-    saturate a matrix
-    """
-    y = ca.SX.zeros(x.shape[0])
-    for i in range(x.shape[0]):
-        y[i] = saturate(x[i], x_min[i], x_max[i])
-    return y
-
+    saturate a matrix, elementwise
 
-def saturate(x, x_min, x_max):
+    fmax ignores a NaN argument, so a NaN element of x maps to x_min
+    rather than passing through
     """
-    saturate
-    """
-    return ca.if_else(x > x_max, x_max, ca.if_else(x < x_min, x_min, x))
+    return ca.fmin(ca.fmax(x, x_min), x_max)
 
 
+@_cached
 def derive_input_acro():
     """
     Acro mode manual input:
@@ -161,7 +250,7 @@ def derive_input_acro():
     f_input_acro = ca.Function(
         "input_acro",
         [thrust_trim, thrust_delta, input_aetr],
-        [w, thrust],
+        ca.cse([w, thrust]),
         [
             "thrust_trim",
             "thrust_delta",
@@ -173,6 +262,7 @@ def derive_input_acro():
     return {"input_acro": f_input_acro}
 
 
+@_cached
 def derive_input_velocity():
     # INPUT VARIABLES
     # -------------------------------
@@ -192,8 +282,11 @@ def derive_input_velocity():
     psi_sp1 = psi_sp + psi_vel_sp * dt
     psi_sp1 = ca.remainder(psi_sp1, 2 * ca.pi)
 
-    cos_yaw = ca.cos(psi_sp1)
-    sin_yaw = ca.sin(psi_sp1)
+    # half angle, shared by the yaw only setpoint quaternion and the rotation
+    c_h = ca.cos(psi_sp1 / 2)
+    s_h = ca.sin(psi_sp1 / 2)
+    cos_yaw = c_h * c_h - s_h * s_h
+    sin_yaw = 2 * c_h * s_h
 
     vb = ca.vertcat(2 * input_aetr[1], -2 * input_aetr[0], input_aetr[2])
     vw_sp = ca.vertcat(
@@ -204,10 +297,10 @@ def derive_input_velocity():
 
     e = pw_sp1 - pw
     e_max = 2
-    e_norm = ca.norm_2(e)
-    e = ca.if_else(e_norm > e_max, 2 * e / e_norm, e)
+    # the epsilon keeps the derivative of the norm finite at zero error
+    e = e * ca.fmin(1, e_max / ca.sqrt(ca.dot(e, e) + 1e-30))
 
-    q_sp = SO3Quat.from_Euler(SO3EulerB321.elem(ca.vertcat(psi_sp1, 0, 0))).param
+    q_sp = ca.vertcat(c_h, 0, 0, s_h)
 
     pw_sp1 = pw + e
 
@@ -222,7 +315,7 @@ def derive_input_velocity():
             input_aetr,
             reset_position,
         ],
-        [psi_sp1, psi_vel_sp, pw_sp1, vw_sp, aw_sp, q_sp],
+        ca.cse([psi_sp1, psi_vel_sp, pw_sp1, vw_sp, aw_sp, q_sp]),
         [
             "dt",
             "psi_sp",
@@ -236,6 +329,7 @@ def derive_input_velocity():
     return {"input_velocity": f_input_velocity}
 
 
+@_cached
 def derive_input_auto_level():
     """
     Auto level mode manual input:
@@ -276,7 +370,7 @@ def derive_input_auto_level():
     f_input_auto_level = ca.Function(
         "input_auto_level",
         [thrust_trim, thrust_delta, input_aetr, q.param],
-        [q_r.param, thrust],
+        ca.cse([q_r.param, thrust]),
         [
             "thrust_trim",
             "thrust_delta",
@@ -289,6 +383,7 @@ def derive_input_auto_level():
     return {"input_auto_level": f_input_auto_level}
 
 
+@_cached
 def derive_attitude_estimator():
     chi = so3.elem(ca.SX.sym("chi", 3))
     wb = so3.elem(ca.SX.sym("wb", 3))
@@ -325,14 +420,16 @@ def derive_attitude_estimator():
     f_cov_prop = ca.Function(
         "attitude_covariance_propagation",
         [sym33_to_vector6(P0), sym33_to_vector6(Q), wb.param, dt],
-        [sym33_to_vector6(ca.triu(P1))],
+        ca.cse([sym33_to_vector6(ca.triu(P1))]),
         ["P0", "Q0", "wb", "dt"],
         ["P1"],
+        _JIT_OPTIONS,
     )
 
     return {"attitude_covariance_propagation": f_cov_prop}
 
 
+@_cached
 def derive_attitude_control():
     """
     Attitude control loop
@@ -351,23 +448,28 @@ def derive_attitude_control():
 
     # CALC
     # -------------------------------
-    X = SO3Quat.elem(q)
-    X_r = SO3Quat.elem(q_r)
+    # error quaternion, dq = q^* q_r
+    w, v = q[0], q[1:]
+    w_r, v_r = q_r[0], q_r[1:]
+    dq0 = w * w_r + ca.dot(v, v_r)
+    dqv = w * v_r - w_r * v - ca.cross(v, v_r)
 
-    # Lie algebra
-    e = (X.inverse() * X_r).log()  # angular velocity to get to desired att in 1 sec
+    # Lie algebra, log(dq), angular velocity to get to desired att in 1 sec
+    nv = ca.norm_2(dqv)
+    e = ca.if_else(nv > 1e-8, 2 * ca.atan2(nv, dq0) * dqv / nv, 2 * dqv / dq0)
 
-    omega = kp * e.param  # elementwise
+    omega = kp * e  # elementwise
 
     # FUNCTION
     # -------------------------------
     f_attitude_control = ca.Function(
-        "attitude_control", [kp, q, q_r], [omega], ["kp", "q", "q_r"], ["omega"]
+        "attitude_control", [kp, q, q_r], ca.cse([omega]), ["kp", "q", "q_r"], ["omega"]
     )
 
     return {"attitude_control": f_attitude_control}
 
 
+@_cached
 def derive_attitude_rate_control():
     """
     Attitude rate control loop
@@ -403,7 +505,7 @@ def derive_attitude_rate_control():
     # first order deriv approx, with low pass filter
 
     # integral action helps balance distrubance moments (e.g. center of gravity offset)
-    i1 = saturatem(i0 + e1 * dt, -i_max, i_max)
+    i1 = ca.fmin(ca.fmax(i0 + e1 * dt, -i_max), i_max)
 
     M = kp * e1 + ki * i1 + kd * de1
 
@@ -412,7 +514,7 @@ def derive_attitude_rate_control():
     f_attitude_rate_control = ca.Function(
         "attitude_rate_control",
         [kp, ki, kd, f_cut, i_max, omega, omega_r, i0, e0, de0, dt],
-        [M, i1, e1, de1, alpha],
+        ca.cse([M, i1, e1, de1, alpha]),
         [
             "kp",
             "ki",
@@ -432,6 +534,30 @@ def derive_attitude_rate_control():
     return {"attitude_rate_control": f_attitude_rate_control}
 
 
+def derive_attitude_rate_control_fixed(dt: float, f_cut: float):
+    """
+    Attitude rate control loop, specialized for a fixed time step and
+    derivative cutoff frequency, so the filter gain is a constant
+    """
+    f = derive_attitude_rate_control()["attitude_rate_control"]
+    fixed = {"dt": dt, "f_cut": f_cut}
+    args = {
+        name: ca.SX.sym(name, f.sparsity_in(name))
+        for name in f.name_in()
+        if name not in fixed
+    }
+    res = f.call({**args, **fixed})
+    f_attitude_rate_control_fixed = ca.Function(
+        "attitude_rate_control_fixed",
+        list(args.values()),
+        ca.cse([res[name] for name in f.name_out()]),
+        list(args.keys()),
+        f.name_out(),
+    )
+    return {"attitude_rate_control_fixed": f_attitude_rate_control_fixed}
+
+
+@_cached
 def derive_position_control():
     """
     Given the position, velocity ,and acceleration set points, find the
@@ -474,12 +600,13 @@ def derive_position_control():
     # normalized thrust vector
     p_norm_max = 0.3 * m * g
     p_term = -kp_pos * e_p - kp_vel * e_v + m * at_w
-    p_norm = ca.norm_2(p_term)
-    p_term = ca.if_else(p_norm > p_norm_max, p_norm_max * p_term / p_norm, p_term)
+    # scale down to p_norm_max, the epsilon keeps the derivative of the norm
+    # finite at zero, where the scale is 1
+    p_term = p_term * ca.fmin(1, p_norm_max / ca.sqrt(ca.dot(p_term, p_term) + 1e-30))
 
     # throttle integral
     z_i_2 = z_i - e_p[2] * dt
-    z_i_2 = saturatem(z_i_2, -ca.vertcat(z_integral_max), ca.vertcat(z_integral_max))
+    z_i_2 = ca.fmin(ca.fmax(z_i_2, -z_integral_max), z_integral_max)
 
     # trim throttle
     T = p_term + thrust_trim * zW + ki_z * z_i * zW
@@ -491,8 +618,9 @@ def derive_position_control():
     zB = ca.if_else(nT > 1e-3, T / nT, zW)
 
     # point y using desired camera direction
-    ec = SO3EulerB321.from_Quat(qc_wb)
-    yt = ec.param[0]
+    # B321 yaw, atan2(R[1, 0], R[0, 0]), without the rest of the euler angles
+    q0, q1, q2, q3 = ca.vertsplit(qc_wb.param)
+    yt = ca.atan2(2 * (q0 * q3 + q1 * q2), q0 * q0 + q1 * q1 - q2 * q2 - q3 * q3)
     xC = ca.vertcat(ca.cos(yt), ca.sin(yt), 0)
     yB = ca.cross(zB, xC)
     nyB = ca.norm_2(yB)
@@ -517,7 +645,7 @@ def derive_position_control():
     f_get_u = ca.Function(
         "position_control",
         [thrust_trim, pt_w, vt_w, at_w, qc_wb.param, p_w, v_w, z_i, dt],
-        [nT, qr_wb.param, z_i_2],
+        ca.cse([nT, qr_wb.param, z_i_2]),
         ["thrust_trim", "pt_w", "vt_w", "at_w", "qc_wb", "p_w", "v_w", "z_i", "dt"],
         ["nT", "qr_wb", "z_i_2"],
     )
@@ -525,17 +653,25 @@ def derive_position_control():
     return {"position_control": f_get_u}
 
 
+@_cached
 def derive_common():
     q = SO3Quat.elem(ca.SX.sym("q", 4))
     vw0 = ca.SX.sym("vw0", 3)
     vb1 = ca.SX.sym("vb1", 3)
-    vb0 = q.inverse() @ vw0
-    vw1 = q @ vb1
+
+    def rotate(q0, qv, v):
+        # unit quaternion rotation, v + q0 t + qv x t with t = 2 qv x v
+        t = 2 * ca.cross(qv, v)
+        return v + q0 * t + ca.cross(qv, t)
+
+    # the inverse rotation uses the conjugate, -qv
+    vb0 = rotate(q.param[0], -q.param[1:], vw0)
+    vw1 = rotate(q.param[0], q.param[1:], vb1)
     f_rotate_vector_w_to_b = ca.Function(
-        "rotate_vector_w_to_b", [q.param, vw0], [vb0], ["q", "vw0"], ["vb0"]
+        "rotate_vector_w_to_b", [q.param, vw0], ca.cse([vb0]), ["q", "vw0"], ["vb0"]
     )
     f_rotate_vector_b_to_w = ca.Function(
-        "rotate_vector_wbto_w", [q.param, vb1], [vw1], ["q", "vb1"], ["vw1"]
+        "rotate_vector_wbto_w", [q.param, vb1], ca.cse([vw1]), ["q", "vb1"], ["vw1"]
     )
     return {
         "rotate_vector_w_to_b": f_rotate_vector_w_to_b,
@@ -543,6 +679,7 @@ def derive_common():
     }
 
 
+@_cached
 def derive_strapdown_ins_propagation():
     """
     INS strapdown propagation
@@ -560,14 +697,25 @@ def derive_strapdown_ins_propagation():
     f_ins = ca.Function(
         "strapdown_ins_propagate",
         [X0.param, a_b, omega_b, g, dt],
-        [X1.param],
+        ca.cse([X1.param]),
         ["x0", "a_b", "omega_b", "g", "dt"],
         ["x1"],
+        _JIT_OPTIONS,
     )
     eqs = {"strapdown_ins_propagate": f_ins}
     return eqs
 
 
+def map_functions(eqs: dict, n: int, parallelization="thread", max_threads=None):
+    """
+    Map each function in eqs over n instances, for evaluating many vehicles in
+    one call. Inputs and outputs of the mapped functions are stacked as columns.
+    """
+    if max_threads is None:
+        max_threads = os.cpu_count()
+    return {name: eq.map(n, parallelization, max_threads) for name, eq in eqs.items()}
+
+
 def generate_code(eqs: dict, filename, dest_dir: str, **kwargs):
     """
     Generate C Code from python CasADi functions.
@@ -585,6 +733,7 @@ def generate_code(eqs: dict, filename, dest_dir: str, **kwargs):
         "with_import": False,
         "include_math": True,
         "avoid_stack": True,
+        "casadi_real": "double",
     }
     for k, v in kwargs.items():
         assert k in p.keys()
@@ -596,6 +745,64 @@ def generate_code(eqs: dict, filename, dest_dir: str, **kwargs):
     gen.generate(str(dest_dir) + os.sep)
 
 
+# flags of the cached native build
+_AOT_FLAGS = ["-O3", "-march=native", "-shared", "-fPIC"]
+
+
+@functools.lru_cache(maxsize=None)
+def _compiler_id():
+    """
+    gcc version and the target options -march=native resolves to on this
+    host, so a cached library is never loaded on a different CPU
+    """
+    return "".join(
+        subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        for cmd in [
+            ["gcc", "--version"],
+            ["gcc"] + _AOT_FLAGS + ["-Q", "--help=target"],
+        ]
+    )
+
+
+def compile_code(eqs: dict, filename="rdd2.c", **kwargs):
+    """
+    Generate C code for eqs, compile it to a shared library, and return
+    compiled versions of eqs, keyed as in eqs.
+
+    Libraries are cached in $CYECCA_AOT_CACHE by a hash of the generated code,
+    the compiler and the host CPU.
+    The library is called through casadi, which passes doubles, so only
+    casadi_real="double" is accepted.
+    """
+    if kwargs.get("casadi_real", "double") != "double":
+        raise ValueError(
+            "compile_code requires casadi_real='double', got {!r}".format(
+                kwargs["casadi_real"]
+            )
+        )
+    cache_dir = Path(os.environ.get("CYECCA_AOT_CACHE", _USER_CACHE / "cyecca_aot"))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generate_code(eqs, filename=filename, dest_dir=tmp_dir, verbose=False, **kwargs)
+        c_code = (Path(tmp_dir) / filename).read_bytes()
+    key = hashlib.sha1(
+        c_code + " ".join(_AOT_FLAGS).encode() + _compiler_id().encode()
+    ).hexdigest()
+    so_path = cache_dir / "{:s}.so".format(key)
+    if not so_path.exists():
+        c_path = cache_dir / "{:s}.c".format(key)
+        _replace_into(c_path, lambda p: p.write_bytes(c_code))
+        # build under a temporary name, so an interrupted build is never loaded
+        _replace_into(
+            so_path,
+            lambda p: subprocess.run(
+                ["gcc"] + _AOT_FLAGS + [str(c_path), "-o", str(p), "-lm"],
+                check=True,
+            ),
+        )
+    return {name: ca.external(eq.name(), str(so_path)) for name, eq in eqs.items()}
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("dest_dir")
@@ -617,4 +824,8 @@ if __name__ == "__main__":
         print("eq: ", name)
 
     generate_code(eqs, filename="rdd2.c", dest_dir=args.dest_dir)
+    # single precision build for targets with a float only FPU
+    generate_code(
+        eqs, filename="rdd2_f32.c", dest_dir=args.dest_dir, casadi_real="float"
+    )
     print("complete")
@@ -23,6 +23,9 @@ def taylor_series_near_zero(x, f, order=6, eps=1e-3, verbose=False):
     """
     symbols = {"x": ca.SX.sym("x")}
     f_series = f.series(x, 0, order).removeO()
+    if f_series.is_polynomial(x):
+        # nested multiplies rather than a pow per term
+        f_series = sympy.horner(f_series, x)
     f_series, _ = sympy_to_casadi(f=f_series, symbols=symbols)
     if verbose:
         print("f_series: ", f_series, "\nf:", f)
@@ -385,6 +388,11 @@ def derive_series(input_squared=False):
     tan = sympy.tan
     atan = sympy.atan
 
+    # closed forms that cancel to x^2 or higher lose most of their digits
+    # below x = 1 in single precision, so in x^2 these switch to a longer
+    # series over a wider window, exact to double precision across it
+    cancels = {"eps": 1, "order": 10} if input_squared else {}
+
     # return series dictionary
     return {
         "cos(x)": taylor_series_near_zero(
@@ -393,35 +401,35 @@ def derive_series(input_squared=False):
         "sin(x)/x": taylor_series_near_zero(u, sin_x / x),
         "x/sin(x)": taylor_series_near_zero(u, x / sin_x),
         "(1 - cos(x))/x": taylor_series_near_zero(u, (1 - cos_x) / x),
-        "(1 - cos(x))/x^2": taylor_series_near_zero(u, (1 - cos_x) / x2),
-        "(x - sin(x))/x^3": taylor_series_near_zero(u, (x - sin_x) / x3),
+        "(1 - cos(x))/x^2": taylor_series_near_zero(u, (1 - cos_x) / x2, **cancels),
+        "(x - sin(x))/x^3": taylor_series_near_zero(u, (x - sin_x) / x3, **cancels),
         "(1 - x*sin(x)/(2*(1 - cos(x))))/x^2": taylor_series_near_zero(
-            u, (1 - x * sin_x / (2 * (1 - cos_x))) / x2
+            u, (1 - x * sin_x / (2 * (1 - cos_x))) / x2, **cancels
         ),
         "(-x^2/2 - cos(x) + 1)/x^2": taylor_series_near_zero(
-            u, (-x2 / 2 - cos_x + 1) / x2
+            u, (-x2 / 2 - cos_x + 1) / x2, **cancels
         ),
         "(x^2/2 + cos(x) - 1)/x^4": taylor_series_near_zero(
-            u, (x2 / 2 + cos_x - 1) / x4
+            u, (x2 / 2 + cos_x - 1) / x4, **cancels
         ),
         "1/x^2": taylor_series_near_zero(u, 1 / x2),
         "(2 - x cos(x))/(2 x^2)": taylor_series_near_zero(
             u, (2 - x * cos_x) / (2 * x2)
         ),
         "1/x^2 + sin(x)/(2 x (cos(x) - 1))": taylor_series_near_zero(
-            u, 1 / x2 + sin_x / (2 * x * (cos_x - 1))
+            u, 1 / x2 + sin_x / (2 * x * (cos_x - 1)), **cancels
         ),
         "(x^2 + 2 cos(x) - 2)/(2 x^4)": taylor_series_near_zero(
-            u, (x2 + 2 * cos_x - 2) / (2 * x4)
+            u, (x2 + 2 * cos_x - 2) / (2 * x4), **cancels
         ),
         "(x cos(x) + 2 x - 3 sin(x))/(2 x^5)": taylor_series_near_zero(
-            u, (x * cos_x + 2 * x - 3 * sin_x) / (2 * x5)
+            u, (x * cos_x + 2 * x - 3 * sin_x) / (2 * x5), **cancels
         ),
         "(x^2 + x sin(x) + 4 cos(x) - 4)/(2 x^6)": taylor_series_near_zero(
-            u, (x2 + x * sin_x + 4 * cos_x - 4) / (2 * x6)
+            u, (x2 + x * sin_x + 4 * cos_x - 4) / (2 * x6), **cancels
         ),
         "(2 - 2 cos(x) - x sin(x))/(2 x^4))": taylor_series_near_zero(
-            u, (2 - 2 * cos_x - x * sin_x) / (2 * x4)
+            u, (2 - 2 * cos_x - x * sin_x) / (2 * x4), **cancels
         ),
         "tan(x/4)/x": taylor_series_near_zero(u, tan(x / 4) / x),
         "4 atan(x)/x": taylor_series_near_zero(u, 4 * atan(x) / x),
@@ -139,3 +139,18 @@ class Test_LieGroupSE2(ProfiledTestCase):
     def test_Ad(self):
         G1 = SE2.elem(self.v1)
         G1_Ad = G1.Ad()
+
+    def test_batch(self):
+        left = ca.horzcat(self.v1, self.v2)
+        right = ca.horzcat(self.v2, self.v1)
+        G3 = SE2.product_batch(left, right)
+        self.assertTrue(
+            SX_close(G3[:, 1], (SE2.elem(self.v2) * SE2.elem(self.v1)).param)
+        )
+        G_inv = SE2.inverse_batch(left)
+        self.assertTrue(SX_close(G_inv[:, 0], SE2.elem(self.v1).inverse().param))
+        self.assertTrue(SX_close(SE2.exp_batch(SE2.log_batch(left)), left))
+        X = SE2.to_Matrix_batch(left)
+        self.assertTrue(SX_close(X[:, 3:], SE2.elem(self.v2).to_Matrix()))
+        G3_thread = SE2.product_batch(left, right, parallelization="thread")
+        self.assertTrue(SX_close(G3_thread, G3))
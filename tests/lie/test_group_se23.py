@@ -7,6 +7,33 @@ import scipy.linalg
 import numpy as np
 
 
+def _mrp_to_dcm(r):
+    """numpy reference for the MRP rotation matrix"""
+    X = np.array([[0, -r[2], r[1]], [r[2], 0, -r[0]], [-r[1], r[0], 0]])
+    n_sq = r @ r
+    return np.eye(3) + (8 * X @ X + 4 * (1 - n_sq) * X) / (1 + n_sq) ** 2
+
+
+def _se23_mrp_product(x1, x2):
+    """numpy reference for the SE23 product, as (p, v, R)"""
+    R1 = _mrp_to_dcm(x1[6:])
+    return x1[:3] + R1 @ x2[:3], x1[3:6] + R1 @ x2[3:6], R1 @ _mrp_to_dcm(x2[6:])
+
+
+def _se23_mrp_inverse(x):
+    """numpy reference for the SE23 inverse, as (p, v, R)"""
+    Rt = _mrp_to_dcm(x[6:]).T
+    return -Rt @ x[:3], -Rt @ x[3:6], Rt
+
+
+def _assert_pvR_close(X, pvR):
+    p, v, R = pvR
+    param = np.array(ca.DM(X.param)).ravel()
+    assert np.allclose(param[:3], p)
+    assert np.allclose(param[3:6], v)
+    assert np.allclose(_mrp_to_dcm(param[6:]), R)
+
+
 @beartype
 class Test_LieGroupSE23Mrp(ProfiledTestCase):
     def setUp(self):
@@ -35,6 +62,9 @@ class Test_LieGroupSE23Mrp(ProfiledTestCase):
         G1 = SE23Mrp.elem(self.v1)
         G2 = SE23Mrp.elem(self.v2)
         G3 = G1 * G2
+        v1 = np.array(self.v1).ravel()
+        v2 = np.array(self.v2).ravel()
+        _assert_pvR_close(G3, _se23_mrp_product(v1, v2))
 
     def test_identity(self):
         G1 = SE23Mrp.elem(self.v1)
@@ -45,14 +75,29 @@ class Test_LieGroupSE23Mrp(ProfiledTestCase):
         G1 = SE23Mrp.elem(self.v1)
         X = G1.to_Matrix()
 
+    def test_batch(self):
+        left = ca.horzcat(self.v1, self.v2)
+        right = ca.horzcat(self.v2, self.v1)
+        G3 = SE23Mrp.product_batch(left, right)
+        G2_G1 = SE23Mrp.elem(self.v2) * SE23Mrp.elem(self.v1)
+        self.assertTrue(SX_close(G3[:, 1], G2_G1.param))
+        self.assertTrue(SX_close(SE23Mrp.exp_batch(SE23Mrp.log_batch(left)), left))
+
     def test_inverse(self):
         G1 = SE23Mrp.elem(self.v1)
         self.assertTrue(SX_close((G1 * G1.inverse()).param, SE23Mrp.identity().param))
+        _assert_pvR_close(G1.inverse(), _se23_mrp_inverse(np.array(self.v1).ravel()))
 
     def test_exp(self):
         g1 = SE23Mrp.algebra.elem(self.v1)
         g1.exp(SE23Mrp)
 
+    def test_exp_matrix(self):
+        x = se23.elem(self.v1)
+        exp_x = scipy.linalg.expm(ca.DM(x.to_Matrix()))
+        X = np.array(ca.DM(x.exp(SE23Mrp).to_Matrix()))
+        self.assertTrue(np.linalg.norm(exp_x - X) < 1e-12)
+
     def test_log(self):
         G1 = SE23Mrp.elem(self.v1)
         G1.log()
@@ -68,6 +113,26 @@ class Test_LieGroupSE23Mrp(ProfiledTestCase):
         Ad_exp_x = np.array(ca.DM(x.exp(SE23Mrp).Ad()))
         self.assertTrue(np.linalg.norm(exp_ad_x - Ad_exp_x) < 1e-12)
 
+    def test_bracket(self):
+        x = se23.elem(self.v1)
+        y = se23.elem(self.v2)
+        X = x.to_Matrix()
+        Y = y.to_Matrix()
+        self.assertTrue(SX_close((x * y).to_Matrix(), X @ Y - Y @ X))
+
+    def test_ad_bracket(self):
+        x = se23.elem(self.v1)
+        y = se23.elem(self.v2)
+        self.assertTrue(SX_close(x.ad() @ y.param, (x * y).param))
+
+    def test_exp_mixed(self):
+        X0 = SE23Mrp.elem(self.v1)
+        l = se23.elem(self.v2 / 10)
+        r = se23.elem(self.v1 / 10)
+        X1 = SE23Mrp.exp_mixed(X0, l, r, ca.SX(2, 2))
+        X2 = r.exp(SE23Mrp) * X0 * l.exp(SE23Mrp)
+        self.assertTrue(SX_close(X1.param, X2.param))
+
     def test_print_group(self):
         print(SE23Mrp)
 
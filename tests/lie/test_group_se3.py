@@ -113,6 +113,12 @@ class Test_LieAlgebraSE3(ProfiledTestCase):
 
         self.assertTrue(SX_close(Jr_inv, scipy.linalg.expm(ca.DM(omega.ad())) @ Jl_inv))
 
+    def test_ad_Ad_exp(self):
+        x = se3.elem(self.v1)
+        exp_ad_x = scipy.linalg.expm(ca.DM(x.ad()))
+        Ad_exp_x = np.array(ca.DM(x.exp(SE3Mrp).Ad()))
+        self.assertTrue(np.linalg.norm(exp_ad_x - Ad_exp_x) < 1e-12)
+
     def test_left_Q(self):
         x = ca.SX.sym("x", 6)
         omega = se3.elem(x)
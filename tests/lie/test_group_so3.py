@@ -265,6 +265,15 @@ class Test_LieGroupSO3Quat(ProfiledTestCase):
         G1 = SO3Quat.elem(self.v1)
         G1.Ad()
 
+    def test_from_Matrix(self):
+        q = np.array([0.9, 0.1, -0.3, 0.2])
+        R0 = SO3Quat.elem(ca.DM(q / np.linalg.norm(q))).to_Matrix()
+        self.assertGreater(float(ca.trace(R0)), 0)
+        # trace > 0, then 180 deg about x, y and z, one per select branch
+        for R in [R0, np.diag([1, -1, -1]), np.diag([-1, 1, -1]), np.diag([-1, -1, 1])]:
+            R1 = SO3Quat.from_Matrix(ca.SX(R)).to_Matrix()
+            self.assertTrue(np.allclose(ca.DM(R1), ca.DM(R), atol=1e-12))
+
 
 class Test_LieGroupSO3Mrp(ProfiledTestCase):
     def setUp(self):
@@ -311,6 +320,12 @@ class Test_LieGroupSO3Mrp(ProfiledTestCase):
         G1 = SO3Mrp.elem(self.v1)
         G1.log()
 
+    def test_log_with_theta_sq(self):
+        G1 = SO3Mrp.elem(0.3 * self.v1 + 0.2 * self.v2)
+        omega, theta_sq = SO3Mrp.log_with_theta_sq(G1)
+        self.assertTrue(SX_close(omega.param, G1.log().param))
+        self.assertTrue(SX_close(theta_sq, ca.dot(omega.param, omega.param)))
+
     def test_exp_log(self):
         G1 = SO3Mrp.elem(self.v1)
         G2 = G1.log().exp(SO3Mrp)
@@ -0,0 +1,284 @@
+from beartype import beartype
+
+from pathlib import Path
+import ctypes
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import casadi as ca
+import numpy as np
+
+from cyecca.lie.group_so3 import SO3Quat, so3
+from cyecca.models import rdd2
+from tests.common import ProfiledTestCase
+
+# keep the derived function and compiled library caches of these tests out
+# of the user cache
+_tmp_dir = None
+_cache_dir = None
+_environ = None
+
+
+def setUpModule():
+    global _tmp_dir, _cache_dir, _environ
+    _tmp_dir = tempfile.TemporaryDirectory()
+    _cache_dir = rdd2._CACHE_DIR
+    rdd2._CACHE_DIR = Path(_tmp_dir.name) / "cyecca_fns"
+    rdd2._load_or_derive.cache_clear()
+    _environ = mock.patch.dict(
+        os.environ, {"CYECCA_AOT_CACHE": str(Path(_tmp_dir.name) / "cyecca_aot")}
+    )
+    _environ.start()
+
+
+def tearDownModule():
+    _environ.stop()
+    rdd2._CACHE_DIR = _cache_dir
+    rdd2._load_or_derive.cache_clear()
+    _tmp_dir.cleanup()
+
+
+def _assert_same_outputs(f1: ca.Function, f2: ca.Function, **fixed):
+    """evaluate f1 and f2 at the same random inputs and compare outputs"""
+    rng = np.random.default_rng(0)
+    args = {name: rng.uniform(0.1, 1, f1.size_in(name)) for name in f1.name_in()}
+    args.update(fixed)
+    res1 = f1.call(args)
+    res2 = f2.call({name: args[name] for name in f2.name_in()})
+    for name in f2.name_out():
+        assert np.allclose(res1[name], res2[name], atol=1e-12), name
+
+
+def _call_generated(f: ca.Function, casadi_real: str, args: list, tmp_dir: str):
+    """
+    generate C code for f with the given casadi_real, build it and call it on
+    args, without going through casadi, which only passes doubles
+    """
+    filename = "{:s}_{:s}.c".format(f.name(), casadi_real)
+    rdd2.generate_code(
+        {f.name(): f},
+        filename=filename,
+        dest_dir=tmp_dir,
+        verbose=False,
+        casadi_real=casadi_real,
+    )
+    so_path = Path(tmp_dir) / (filename + ".so")
+    subprocess.run(
+        ["gcc", "-O2", "-shared", "-fPIC", str(Path(tmp_dir) / filename)]
+        + ["-o", str(so_path), "-lm"],
+        check=True,
+    )
+    lib = ctypes.CDLL(str(so_path))
+    real = {"float": ctypes.c_float, "double": ctypes.c_double}[casadi_real]
+    sz = [ctypes.c_longlong() for _ in range(4)]
+    getattr(lib, f.name() + "_work")(*[ctypes.byref(n) for n in sz])
+    sz_arg, sz_res, sz_iw, sz_w = [n.value for n in sz]
+    res = []
+    for arg in args:
+        arg_bufs = [(real * len(a))(*a) for a in arg]
+        res_bufs = [(real * f.nnz_out(i))() for i in range(f.n_out())]
+        p_arg = (ctypes.c_void_p * sz_arg)(
+            *[ctypes.cast(b, ctypes.c_void_p) for b in arg_bufs]
+        )
+        p_res = (ctypes.c_void_p * sz_res)(
+            *[ctypes.cast(b, ctypes.c_void_p) for b in res_bufs]
+        )
+        iw = (ctypes.c_longlong * max(sz_iw, 1))()
+        w = (real * max(sz_w, 1))()
+        assert getattr(lib, f.name())(p_arg, p_res, iw, w, 0) == 0
+        res.append([np.array(b[:]) for b in res_bufs])
+    return res
+
+
+@beartype
+class Test_Rdd2Cache(ProfiledTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = rdd2._CACHE_DIR
+        rdd2._CACHE_DIR = Path(self.tmp_dir.name) / "cyecca_fns"
+        rdd2._load_or_derive.cache_clear()
+
+    def tearDown(self):
+        rdd2._CACHE_DIR = self.cache_dir
+        rdd2._load_or_derive.cache_clear()
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def derive_uncached(self):
+        return rdd2.derive_attitude_control.__wrapped__()["attitude_control"]
+
+    def test_round_trip(self):
+        rdd2.derive_attitude_control()
+        self.assertTrue(list(rdd2._CACHE_DIR.glob("*.casadi")))
+        rdd2._load_or_derive.cache_clear()
+        f = rdd2.derive_attitude_control()["attitude_control"]
+        _assert_same_outputs(self.derive_uncached(), f)
+
+    def test_corrupt_cache(self):
+        rdd2.derive_attitude_control()
+        for path in rdd2._CACHE_DIR.glob("*.casadi"):
+            path.write_bytes(path.read_bytes()[:10])
+        rdd2._load_or_derive.cache_clear()
+        f = rdd2.derive_attitude_control()["attitude_control"]
+        _assert_same_outputs(self.derive_uncached(), f)
+
+        # the corrupt entry is replaced
+        rdd2._load_or_derive.cache_clear()
+        f = rdd2.derive_attitude_control()["attitude_control"]
+        _assert_same_outputs(self.derive_uncached(), f)
+
+    def test_unwritable_cache(self):
+        rdd2._CACHE_DIR = Path("/proc/nope/cyecca_fns")
+        f = rdd2.derive_attitude_control()["attitude_control"]
+        _assert_same_outputs(self.derive_uncached(), f)
+
+
+def _jacobian_is_finite(f: ca.Function, **args) -> bool:
+    """check the jacobian of all outputs of f wrt all inputs is finite at args"""
+    res = f.call(args)
+    jac = f.jacobian().call({**args, **{"out_" + k: v for k, v in res.items()}})
+    return all(np.all(np.isfinite(np.array(v))) for v in jac.values())
+
+
+@beartype
+class Test_Rdd2Control(ProfiledTestCase):
+    def test_position_control_jacobian_zero_error(self):
+        f = rdd2.derive_position_control()["position_control"]
+        self.assertTrue(
+            _jacobian_is_finite(
+                f,
+                thrust_trim=rdd2.m * rdd2.g,
+                pt_w=[1, 2, 3],
+                vt_w=[0, 0, 0],
+                at_w=[0, 0, 0],
+                qc_wb=[1, 0, 0, 0],
+                p_w=[1, 2, 3],
+                v_w=[0, 0, 0],
+                z_i=0,
+                dt=0.01,
+            )
+        )
+
+    def test_input_velocity_jacobian_zero_error(self):
+        f = rdd2.derive_input_velocity()["input_velocity"]
+        for reset_position in [0, 1]:
+            self.assertTrue(
+                _jacobian_is_finite(
+                    f,
+                    dt=0.01,
+                    psi_sp=0,
+                    pw_sp=[1, 2, 3],
+                    pw=[1, 2, 3],
+                    input_aetr=[0, 0, 0, 0],
+                    reset_position=reset_position,
+                )
+            )
+
+    def test_attitude_rate_control_fixed(self):
+        f = rdd2.derive_attitude_rate_control()["attitude_rate_control"]
+        f_fixed = rdd2.derive_attitude_rate_control_fixed(dt=0.005, f_cut=20.0)[
+            "attitude_rate_control_fixed"
+        ]
+        _assert_same_outputs(f, f_fixed, dt=0.005, f_cut=20.0)
+
+    def test_map_functions(self):
+        n = 5
+        eqs = rdd2.derive_attitude_control()
+        f = eqs["attitude_control"]
+        f_map = rdd2.map_functions(eqs, n)["attitude_control"]
+        rng = np.random.default_rng(0)
+        args = {
+            name: rng.uniform(0.1, 1, (f.size1_in(name), n)) for name in f.name_in()
+        }
+        res = f_map.call(args)
+        for i in range(n):
+            res_i = f.call({name: v[:, i] for name, v in args.items()})
+            for name in f.name_out():
+                assert np.allclose(res[name][:, i], res_i[name]), name
+
+    @unittest.skipIf(shutil.which("gcc") is None, "requires gcc")
+    def test_compile_code(self):
+        eqs = rdd2.derive_attitude_control()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch.dict(os.environ, {"CYECCA_AOT_CACHE": tmp_dir}):
+                f_so = rdd2.compile_code(eqs)["attitude_control"]
+                self.assertEqual(len(list(Path(tmp_dir).glob("*.so"))), 1)
+                # a library built for another CPU is not reused
+                with mock.patch.object(rdd2, "_compiler_id", lambda: "other host"):
+                    rdd2.compile_code(eqs)
+                self.assertEqual(len(list(Path(tmp_dir).glob("*.so"))), 2)
+            _assert_same_outputs(eqs["attitude_control"], f_so)
+
+    def test_compile_code_rejects_float(self):
+        eqs = rdd2.derive_attitude_control()
+        with self.assertRaises(ValueError):
+            rdd2.compile_code(eqs, casadi_real="float")
+
+    @unittest.skipIf(shutil.which("gcc") is None, "requires gcc")
+    def test_strapdown_ins_float(self):
+        # float build against double build, across the series switch over of
+        # the exp coefficients, for a body rate rotation angle theta
+        f = rdd2.derive_strapdown_ins_propagation()["strapdown_ins_propagate"]
+        rng = np.random.default_rng(0)
+        dt = 0.01
+        args = []
+        for theta in np.linspace(0.005, 1.5, 300):
+            q = rng.normal(size=4)
+            u = rng.normal(size=3)
+            args.append(
+                [
+                    np.hstack([np.zeros(6), q / np.linalg.norm(q)]),
+                    rng.normal(size=3) * 5,
+                    theta / dt * u / np.linalg.norm(u),
+                    [9.8],
+                    [dt],
+                ]
+            )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            x_f32 = _call_generated(f, "float", args, tmp_dir)
+            x_f64 = _call_generated(f, "double", args, tmp_dir)
+        for (x1_f32,), (x1_f64,) in zip(x_f32, x_f64):
+            # position and velocity increments from a zero start, and attitude
+            for a, b in [(x1_f32[:3], x1_f64[:3]), (x1_f32[3:6], x1_f64[3:6])]:
+                self.assertLess(np.linalg.norm(a - b) / np.linalg.norm(b), 1e-5)
+            self.assertLess(np.linalg.norm(x1_f32[6:] - x1_f64[6:]), 1e-6)
+
+    def test_attitude_control(self):
+        f = rdd2.derive_attitude_control()["attitude_control"]
+        rng = np.random.default_rng(0)
+        kp = ca.DM([1.0, 2.0, 3.0])
+        pairs = []
+        for _ in range(20):
+            q, q_r = rng.normal(size=(2, 4))
+            pairs.append((q / np.linalg.norm(q), q_r / np.linalg.norm(q_r)))
+        # near identity error, through the 2 dqv / dq0 branch
+        q = pairs[0][0]
+        dq = so3.elem(ca.DM([3e-9, -2e-9, 1e-9])).exp(SO3Quat)
+        pairs.append((q, ca.DM((SO3Quat.elem(ca.DM(q)) * dq).param).full().ravel()))
+        for q, q_r in pairs:
+            omega = f(kp, q, q_r)
+            e = (SO3Quat.elem(ca.DM(q)).inverse() * SO3Quat.elem(ca.DM(q_r))).log()
+            self.assertTrue(
+                np.allclose(
+                    omega.full(), ca.DM(kp * e.param).full(), rtol=1e-9, atol=1e-15
+                ),
+                (q, q_r),
+            )
+
+    def test_rotate_vector(self):
+        eqs = rdd2.derive_common()
+        f_b_to_w = eqs["rotate_vector_b_to_w"]
+        f_w_to_b = eqs["rotate_vector_w_to_b"]
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            q = rng.normal(size=4)
+            q /= np.linalg.norm(q)
+            v = rng.normal(size=3)
+            R = ca.DM(SO3Quat.elem(ca.DM(q)).to_Matrix()).full()
+            self.assertTrue(np.allclose(f_b_to_w(q, v).full().ravel(), R @ v))
+            self.assertTrue(np.allclose(f_w_to_b(q, v).full().ravel(), R.T @ v))